@@ -56,8 +56,9 @@ class ApprIRL(BaseIRLAlgorithm):
         self.expert_feature_count = self.feature_count(self.expert_trajs,
                                                        self.config['gamma'])
 
-        print('EXPERT FEATURE COUNT:')
-        print(self.expert_feature_count)
+        if self.config['verbose']:
+            print('EXPERT FEATURE COUNT:')
+            print(self.expert_feature_count)
 
         # create list of feature counts:
         self.feature_counts = [self.expert_feature_count]
@@ -108,8 +109,9 @@ class ApprIRL(BaseIRLAlgorithm):
             current_feature_count = self.feature_count(
                 trajs, gamma=self.config['gamma'])
 
-            print('CURRENT FEATURE COUNT:')
-            print(current_feature_count)
+            if self.config['verbose']:
+                print('CURRENT FEATURE COUNT:')
+                print(current_feature_count)
 
             # add new feature count to list of feature counts
             self.feature_counts.append(current_feature_count)
@@ -181,7 +183,8 @@ class ApprIRL(BaseIRLAlgorithm):
 
             self.distances.append(distance)
 
-            print(reward_coefficients)
+            if self.config['verbose']:
+                print(reward_coefficients)
             # update reward function
             reward_wrapper = unwrap_env(self.env, RewardWrapper)
             reward_wrapper.update_reward_parameters(reward_coefficients)
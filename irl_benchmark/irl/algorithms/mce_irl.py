@@ -1,8 +1,12 @@
 """Module for Maximum Causal Entropy IRL."""
+from concurrent.futures import ThreadPoolExecutor
 from typing import Callable, Dict, List
 
 import gym
 import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+import sparse
 
 from irl_benchmark.config import IRL_CONFIG_DOMAINS, IRL_ALG_REQUIREMENTS
 from irl_benchmark.irl.algorithms.base_algorithm import BaseIRLAlgorithm
@@ -29,14 +33,48 @@ class MaxCausalEntIRL(BaseIRLAlgorithm):
         super(MaxCausalEntIRL, self).__init__(env, expert_trajs,
                                               rl_alg_factory, metrics, config)
 
-        # get transition matrix (with absorbing state)
+        # get transition matrix (with absorbing state).
+        # Probabilities don't need double precision for computing occupancy
+        # measures, single precision halves the memory traffic:
         self.transition_matrix = unwrap_env(
-            env, BaseWorldModelWrapper).get_transition_array()
+            env, BaseWorldModelWrapper).get_transition_array().astype(
+                np.float32)
         self.n_states, self.n_actions, _ = self.transition_matrix.shape
 
         # get map of features for all states:
         feature_wrapper = unwrap_env(env, FeatureWrapper)
         self.feat_map = feature_wrapper.feature_array()
+        # with one-hot state features (as for FrozenLake) the feature map is
+        # the identity and multiplying with it can be skipped entirely:
+        if self.feat_map.ndim == 2 \
+                and self.feat_map.shape[0] == self.feat_map.shape[1] \
+                and np.array_equal(self.feat_map, np.eye(len(self.feat_map))):
+            self.feat_map = None
+
+        # expert trajectories don't change, so their states and actions
+        # are converted to flat index arrays only once.
+        # traj['states'][0] is the state of the first timestep of the trajectory:
+        self._expert_initial_states = np.array(
+            [traj['states'][0] for traj in expert_trajs], dtype=np.int64)
+        # the last state of a trajectory has no action and is not counted:
+        self._expert_states = np.concatenate([
+            np.array(traj['states'][:len(traj['actions'])], dtype=np.int64)
+            for traj in expert_trajs
+        ])
+        self._expert_actions = np.concatenate([
+            np.array(traj['actions'], dtype=np.int64) for traj in expert_trajs
+        ])
+
+        # warm start for iteratively computed occupancy measures:
+        self._last_occupancy = None
+        # contraction order for state-action feature counts, found on first use:
+        self._feature_count_path = None
+
+        # statistics of the expert demonstrations are constant during training:
+        self.sa_visit_count, self.initial_state_dist = self.sa_visitations()
+        # calculate expert feature expectations:
+        self.expert_feature_count = self.feature_count(
+            self.expert_trajs, gamma=1.0)
 
     def sa_visitations(self):
         """
@@ -46,18 +84,13 @@ class MaxCausalEntIRL(BaseIRLAlgorithm):
             Arrays of shape (n_states, n_actions) and (n_states).
         """
 
-        s0_count = np.zeros(self.n_states)
-        sa_visit_count = np.zeros((self.n_states, self.n_actions))
-
-        for traj in self.expert_trajs:
-            # traj['states'][0] is the state of the first timestep of the trajectory.
-            s0_count[traj['states'][0]] += 1
-
-            for timestep in range(len(traj['actions'])):
-                state = traj['states'][timestep]
-                action = traj['actions'][timestep]
-
-                sa_visit_count[state, action] += 1
+        s0_count = np.bincount(
+            self._expert_initial_states, minlength=self.n_states)
+        # count each (state, action) pair by its index in the flattened array:
+        sa_visit_count = np.bincount(
+            self._expert_states * self.n_actions + self._expert_actions,
+            minlength=self.n_states * self.n_actions).reshape(
+                (self.n_states, self.n_actions)).astype(np.float64)
 
         # Count into probability
         P0 = s0_count / len(self.expert_trajs)
@@ -74,39 +107,131 @@ class MaxCausalEntIRL(BaseIRLAlgorithm):
         -- the expected discounted number of times that policy π visits state s in
         a given number of timesteps, as in Algorithm 9.3 of Ziebart's thesis:
         http://www.cs.cmu.edu/~bziebart/publications/thesis-bziebart.pdf.
+
+        If t_max is None, the infinite-horizon occupancy measure is computed
+        exactly by solving the linear system (I - gamma * P_pi^T) d = P0 instead
+        of iterating until convergence. For sparse transitions the fixed point
+        is iterated instead, starting from the last computed occupancy measure.
+        Otherwise at most t_max steps are taken, stopping early once the change
+        per step is guaranteed to be below threshold.
         """
 
         if initial_state_dist is None:
             initial_state_dist = np.ones(self.n_states) / self.n_states
-        d_prev = np.zeros_like(initial_state_dist)
-
-        t = 0
-
-        diff = float("inf")
+        # use the same precision as the transition matrix:
+        policy = policy.astype(np.float32, copy=False)
+        initial_state_dist = initial_state_dist.astype(np.float32, copy=False)
+
+        # probability of going from state s to state s' under the policy.
+        # This is constant for all iterations below, so it is computed once:
+        if isinstance(self.transition_matrix, sparse.COO):
+            # keep sparse transitions sparse, shape (n_states, n_states):
+            policy_transitions = (self.transition_matrix *
+                                  policy[:, :, np.newaxis]).sum(axis=1).tocsr()
+        else:
+            policy_transitions = np.einsum('sa,san->sn', policy,
+                                           self.transition_matrix)
+
+        if t_max is None:
+            # the occupancy measure is the fixed point of
+            # d = P0 + gamma * P_pi^T d, which can be solved for directly:
+            if not scipy.sparse.issparse(policy_transitions):
+                return np.linalg.solve(
+                    np.eye(self.n_states, dtype=np.float32) -
+                    self.config['gamma'] * policy_transitions.T,
+                    initial_state_dist)
+            if self.config['gamma'] >= 1.:
+                return scipy.sparse.linalg.spsolve(
+                    (scipy.sparse.identity(self.n_states, dtype=np.float32) -
+                     self.config['gamma'] * policy_transitions.T).tocsc(),
+                    initial_state_dist)
+            # for large sparse systems, iterating sparse matrix-vector products
+            # is cheaper than a sparse LU decomposition. The policy changes only
+            # slightly between IRL iterations, so the last occupancy measure
+            # is a good starting point:
+            if self._last_occupancy is not None \
+                    and self._last_occupancy.shape == initial_state_dist.shape:
+                d_init = self._last_occupancy
+            else:
+                d_init = np.zeros(self.n_states, dtype=np.float32)
+            self._last_occupancy = self._iterate_occupancy(
+                policy_transitions, initial_state_dist, d_init, None,
+                threshold)
+            return self._last_occupancy
+
+        return self._iterate_occupancy(
+            policy_transitions, initial_state_dist,
+            np.zeros(self.n_states, dtype=np.float32), t_max, threshold)
+
+    def _iterate_occupancy(self, policy_transitions, initial_state_dist,
+                           d_init, t_max, threshold):
+        """
+        Iterates d = P0 + gamma * P_pi^T d starting from d_init, for at most
+        t_max steps (no limit if None). Stops early once the change per step is
+        guaranteed to be below threshold.
+        """
 
-        while diff > threshold:
+        # buffers are allocated once and reused in every iteration:
+        d_prev = np.array(d_init, dtype=np.float32)
+        d = np.empty(self.n_states, dtype=np.float32)
 
-            d = np.copy(initial_state_dist)
+        n_iterations = t_max
+        t = 0
 
-            for state in range(self.n_states):
-                for action in range(self.n_actions):
-                    # for all next_state reachable:
+        while n_iterations is None or t < n_iterations:
+
+            # probability of reaching each next state in one more step:
+            if scipy.sparse.issparse(policy_transitions):
+                d[:] = policy_transitions.T.dot(d_prev)
+            else:
+                np.dot(d_prev, policy_transitions, out=d)
+            d *= self.config['gamma']
+            d += initial_state_dist
+
+            if t == 0 and self.config['gamma'] < 1.:
+                # Every further step shrinks the change by gamma (P_pi is
+                # row-stochastic), so the number of steps until the change falls
+                # below the threshold is known after the first step and no
+                # convergence check is needed:
+                initial_diff = np.sum(np.abs(d - d_prev))
+                needed_iterations = 1
+                if initial_diff > threshold:
+                    needed_iterations += int(
+                        np.ceil(
+                            np.log(threshold / initial_diff) /
+                            np.log(max(self.config['gamma'], 1e-12))))
+                if n_iterations is None or needed_iterations < n_iterations:
+                    n_iterations = needed_iterations
+
+            # swap buffers instead of copying, old values are overwritten next:
+            d_prev, d = d, d_prev
+            t += 1
 
-                    for next_state in range(self.n_states):
-                        # probabilty of reaching next_state by taking action
-                        prob = self.transition_matrix[state, action,
-                                                      next_state]
-                        d[next_state] += self.config['gamma'] * d_prev[
-                            state] * policy[state, action] * prob
+        return d_prev
 
-            diff = np.amax(abs(d_prev - d))  # maxima of the flattened array
-            d_prev = np.copy(d)
+    def policy_feature_count(self, policy, occupancy):
+        """
+        Computes the expected feature count of a policy from its occupancy
+        measure (without absorbing state). State features of shape
+        (n_states, d) are weighted by the occupancy measure. State-action
+        features of shape (n_states, n_actions, d) are additionally weighted by
+        the probability of picking each action.
+        """
 
-            if t_max is not None:
-                t += 1
-                if t == t_max:
-                    break
-        return d_prev
+        if self.feat_map is None:
+            # identity feature map:
+            return occupancy
+        if self.feat_map.ndim == 2:
+            return np.dot(self.feat_map.T, occupancy)
+
+        operands = (occupancy, policy[:len(occupancy)], self.feat_map)
+        if self._feature_count_path is None:
+            # shapes are the same in every IRL iteration,
+            # so an optimal contraction order only has to be found once:
+            self._feature_count_path = np.einsum_path(
+                's,sa,saf->f', *operands, optimize='optimal')[0]
+        return np.einsum(
+            's,sa,saf->f', *operands, optimize=self._feature_count_path)
 
     def train(self, no_irl_iterations: int,
               no_rl_episodes_per_irl_iteration: int,
@@ -115,17 +240,19 @@ class MaxCausalEntIRL(BaseIRLAlgorithm):
 
         """
 
-        sa_visit_count, P0 = self.sa_visitations()
-
-        # calculate feature expectations
-        expert_feature_count = self.feature_count(self.expert_trajs, gamma=1.0)
-
         # initialize the parameters
         reward_function = FeatureBasedRewardFunction(self.env, 'random')
         theta = reward_function.parameters
 
         agent = self.rl_alg_factory(self.env)
 
+        reward_wrapper = unwrap_env(self.env, RewardWrapper)
+
+        # computes occupancy measures in the background if
+        # config['lagged_occupancy'] is set:
+        executor = ThreadPoolExecutor(max_workers=1)
+        policy = None
+
         irl_iteration_counter = 0
 
         while irl_iteration_counter < no_irl_iterations:
@@ -134,9 +261,19 @@ class MaxCausalEntIRL(BaseIRLAlgorithm):
             if self.config['verbose']:
                 print('IRL ITERATION ' + str(irl_iteration_counter))
 
-            reward_wrapper = unwrap_env(self.env, RewardWrapper)
             reward_wrapper.update_reward_parameters(theta)
 
+            if self.config['lagged_occupancy'] and policy is not None:
+                # occupancy measure of the previous policy is calculated
+                # while the agent is trained:
+                occupancy_policy = policy
+                occupancy_future = executor.submit(
+                    self.occupancy_measure,
+                    policy=occupancy_policy,
+                    initial_state_dist=self.initial_state_dist)
+            else:
+                occupancy_future = None
+
             # compute policy
             agent.train(no_rl_episodes_per_irl_iteration)
 
@@ -145,11 +282,19 @@ class MaxCausalEntIRL(BaseIRLAlgorithm):
             q_values = agent.q_values
 
             # occupancy measure
-            d = self.occupancy_measure(
-                policy=policy, initial_state_dist=P0)[:-1]
+            if occupancy_future is None:
+                occupancy_policy = policy
+                d = self.occupancy_measure(
+                    policy=occupancy_policy,
+                    initial_state_dist=self.initial_state_dist)[:-1]
+            else:
+                d = occupancy_future.result()[:-1]
+
+            # expected feature count under the policy of the occupancy measure:
+            feature_count = self.policy_feature_count(occupancy_policy, d)
 
             # log-likeilihood gradient
-            grad = -(expert_feature_count - np.dot(self.feat_map.T, d))
+            grad = -(self.expert_feature_count - feature_count)
 
             # graduate descent
             theta -= self.config['lr'] * grad
@@ -160,6 +305,8 @@ class MaxCausalEntIRL(BaseIRLAlgorithm):
             }
             self.evaluate_metrics(evaluation_input)
 
+        executor.shutdown()
+
         return theta
 
 
@@ -179,6 +326,12 @@ IRL_CONFIG_DOMAINS[MaxCausalEntIRL] = {
         'default': 0.02,
         'min': 0.000001,
         'max': 50
+    },
+    # if True, the gradient of each IRL iteration uses the occupancy measure
+    # of the previous iteration's policy, computed in parallel to RL training:
+    'lagged_occupancy': {
+        'type': bool,
+        'default': False
     }
 }
 
@@ -179,6 +179,11 @@ class FrozenLakeFeatureWrapper(FeatureWrapper):
 
 
 class MazeWorldFeatureWrapper(FeatureWrapper):
+    def __init__(self, env: gym.Env):
+        super(MazeWorldFeatureWrapper, self).__init__(env)
+        # features are calculated very often, only unwrap once:
+        self.maze_env = unwrap_env(self.env, MazeWorld)
+
     def features(self, current_state: np.ndarray, action: int,
                  next_state: None) -> np.ndarray:
         """Return features to be saved in step method's info dictionary.
@@ -188,7 +193,7 @@ class MazeWorldFeatureWrapper(FeatureWrapper):
         a medium reward field, probability of reaching a large reward field.
         Only one of the last three values will be non-zero."""
 
-        maze_env = unwrap_env(self.env, MazeWorld)
+        maze_env = self.maze_env
 
         # can only calculate features for a single state-action pair.
         assert len(current_state.shape) == 1
@@ -255,7 +260,7 @@ class MazeWorldFeatureWrapper(FeatureWrapper):
             The features for the entire domain as an array.
             Shape: (domain_size, d).
         """
-        maze_world = unwrap_env(self.env, MazeWorld)
+        maze_world = self.maze_env
         num_rewards = maze_world.num_rewards
         n_states = num_rewards * 2**num_rewards
         feature_array = np.zeros((n_states, num_rewards, 4))
@@ -280,9 +280,13 @@ class FeatureBasedRewardFunction(BaseRewardFunction):
         super(FeatureBasedRewardFunction, self).__init__(
             env, parameters, action_in_domain, next_state_in_domain)
 
+        # the feature wrapper is needed for each reward calculation,
+        # only unwrap once:
+        self.feature_wrapper = utils.wrapper.unwrap_env(
+            self.env, FeatureWrapper)
+
         if parameters == 'random':
-            parameters_shape = utils.wrapper.unwrap_env(
-                self.env, FeatureWrapper).feature_dimensionality()
+            parameters_shape = self.feature_wrapper.feature_dimensionality()
             self.parameters = np.random.standard_normal(parameters_shape)
 
     def reward_from_features(self, feature_batch: np.ndarray) -> np.ndarray:
@@ -337,8 +341,7 @@ class FeatureBasedRewardFunction(BaseRewardFunction):
             A numpy array containing features.
 
         """
-        # Get the feature wrapper for the environment:
-        feature_wrapper = utils.wrapper.unwrap_env(self.env, FeatureWrapper)
+        feature_wrapper = self.feature_wrapper
 
         assert isinstance(domain_batch.state, (np.ndarray, tuple, float, int))
 
@@ -102,16 +102,37 @@ class RewardWrapper(gym.Wrapper):
         Union[State, StateAction, StateActionState]
             The input converted to an adequate namedtuple.
         """
+        if next_state is not None:
+            next_state = np.array([next_state])
+        return self.get_reward_input_for_batch(
+            np.array([state]), np.array([action]), next_state)
+
+    def get_reward_input_for_batch(
+            self, states: np.ndarray, actions: np.ndarray,
+            next_states: Union[np.ndarray, None]
+    ) -> Union[State, StateAction, StateActionState]:
+        """Like :meth:`.get_reward_input_for`, but for a whole batch of inputs,
+        so that the reward function needs to be called only once.
+
+        Parameters
+        ----------
+        states: np.ndarray
+        actions: np.ndarray
+        next_states: Union[np.ndarray, None]
+
+        Returns
+        -------
+        Union[State, StateAction, StateActionState]
+            The input batch converted to an adequate namedtuple.
+        """
         if self.reward_function.action_in_domain:
             if self.reward_function.next_state_in_domain:
-                return StateActionState(
-                    np.array([state]), np.array([action]),
-                    np.array([next_state]))
+                return StateActionState(states, actions, next_states)
             else:
-                return StateAction(np.array([state]), np.array([action]))
+                return StateAction(states, actions)
         else:
             if not self.reward_function.action_in_domain \
                     and not self.reward_function.next_state_in_domain \
-                    and next_state is not None:
-                state = next_state
-            return State(np.array([state]))
+                    and next_states is not None:
+                states = next_states
+            return State(states)
@@ -1,3 +1,5 @@
+from typing import Tuple
+
 from gym.envs.toy_text.discrete import DiscreteEnv
 import numpy as np
 
@@ -6,6 +8,35 @@ from irl_benchmark.rl.model.model_wrapper import BaseWorldModelWrapper
 from irl_benchmark.utils.wrapper import is_unwrappable_to, unwrap_env
 
 
+def _outcome_arrays(env: DiscreteEnv) -> Tuple[np.ndarray, ...]:
+    """Flatten the nested transition dictionary env.P of a DiscreteEnv.
+
+    Parameters
+    ----------
+    env: DiscreteEnv
+        An unwrapped DiscreteEnv.
+
+    Returns
+    -------
+    Tuple[np.ndarray, ...]
+        Arrays of states, actions, next states, probabilities, rewards and
+        done flags. Each array has one entry per possible outcome of
+        each state-action pair.
+    """
+    outcomes = []
+    for state, transitions_given_state in env.P.items():
+        for action, outcomes_given_action in transitions_given_state.items():
+            for probability, next_state, reward, done in outcomes_given_action:
+                outcomes.append(
+                    (state, action, next_state, probability, reward, done))
+    states, actions, next_states, probabilities, rewards, dones = zip(
+        *outcomes)
+    return (np.array(states, dtype=np.int64),
+            np.array(actions, dtype=np.int64),
+            np.array(next_states, dtype=np.int64),
+            np.array(probabilities, dtype=np.float64),
+            np.array(rewards, dtype=np.float64), np.array(dones, dtype=bool))
+
 class DiscreteEnvModelWrapper(BaseWorldModelWrapper):
     def __init__(self, env):
         assert is_unwrappable_to(env, DiscreteEnv)
@@ -32,23 +63,24 @@ class DiscreteEnvModelWrapper(BaseWorldModelWrapper):
 
         transitions = np.zeros([n_states, n_actions, n_states])
 
-        # iterate over all "from" states:
-        for state, transitions_given_state in env.P.items():
-            # iterate over all actions:
-            for action, outcomes in transitions_given_state.items():
-                # iterate over all possible outcomes:
-                for probability, next_state, _, done in outcomes:
-                    # add transition probability T(s, a, s')
-                    transitions[state, action, next_state] += probability
-                    if done:
-                        # outcome was marked as ending the game.
-                        # if game is done and state == next_state, map to absorbing state instead
-                        if state == next_state:
-                            transitions[state, action, next_state] = 0
-                        # map next state to absorbing state
-                        # make sure that next state wasn't mapped to any other state yet
-                        assert np.sum(transitions[next_state, :, :-1]) == 0
-                        transitions[next_state, :, -1] = 1.0
+        states, actions, next_states, probabilities, _, dones = \
+            _outcome_arrays(env)
+
+        # add transition probabilities T(s, a, s') of all outcomes at once.
+        # np.add.at is unbuffered, so duplicate outcomes are summed up:
+        np.add.at(transitions, (states, actions, next_states), probabilities)
+
+        # if game is done and state == next_state, map to absorbing state instead:
+        done_in_place = dones & (states == next_states)
+        transitions[states[done_in_place], actions[done_in_place],
+                    next_states[done_in_place]] = 0
+
+        # next states of outcomes marked as ending the game
+        # are mapped to the absorbing state:
+        terminal_states = np.unique(next_states[dones])
+        # make sure that terminal states aren't mapped to any other state:
+        assert np.sum(transitions[terminal_states, :, :-1]) == 0
+        transitions[terminal_states, :, -1] = 1.0
 
         # specify transition probabilities for absorbing state:
         # returning to itself for all actions.
@@ -73,22 +105,22 @@ class DiscreteEnvModelWrapper(BaseWorldModelWrapper):
 
         rewards = np.zeros([n_states, n_actions])
 
-        # iterate over all "from" states:
-        for state, transitions_given_state in env.P.items():
-            # iterate over all actions:
-            for action, outcomes in transitions_given_state.items():
-                # iterate over all possible outcomes:
-                for probability, next_state, reward, done in outcomes:
-                    if reward_function is not None:
-                        if done and state == next_state:
-                            # don't output reward for reaching state if game is over
-                            # and already in that state.
-                            reward = 0
-                        else:
-                            rew_input = reward_wrapper.get_reward_input_for(
-                                state, action, next_state)
-                            reward = reward_function.reward(rew_input)
-                    rewards[state, action] += reward * probability
+        states, actions, next_states, probabilities, outcome_rewards, dones = \
+            _outcome_arrays(env)
+
+        if reward_function is not None:
+            # calculate rewards of all outcomes with a single call:
+            rew_input = reward_wrapper.get_reward_input_for_batch(
+                states, actions, next_states)
+            outcome_rewards = np.array(
+                reward_function.reward(rew_input),
+                dtype=np.float64).reshape(-1)
+            # don't output reward for reaching state if game is over
+            # and already in that state.
+            outcome_rewards[dones & (states == next_states)] = 0
+
+        # sum up expected rewards of all outcomes for each (s, a):
+        np.add.at(rewards, (states, actions), outcome_rewards * probabilities)
 
         # reward of absorbing state is zero:
         rewards[-1, :] = 0.0
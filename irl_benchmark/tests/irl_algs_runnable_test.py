@@ -191,3 +191,4 @@ def test_me_irl_runs():
 
 def test_mce_irl_runs():
     quick_run_alg(MaxCausalEntIRL)
+    quick_run_alg(MaxCausalEntIRL, {'lagged_occupancy': True})
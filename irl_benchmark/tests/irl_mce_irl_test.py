@@ -0,0 +1,161 @@
+import numpy as np
+import sparse
+
+from irl_benchmark.envs import make_wrapped_env
+from irl_benchmark.irl.algorithms.mce_irl import MaxCausalEntIRL
+from irl_benchmark.irl.reward.reward_function import FeatureBasedRewardFunction
+from irl_benchmark.rl.algorithms import ValueIteration
+from irl_benchmark.utils.general import to_one_hot
+
+
+def make_mce_irl():
+    def reward_function_factory(env):
+        return FeatureBasedRewardFunction(env, 'random')
+
+    env = make_wrapped_env(
+        'FrozenLake-v0',
+        with_feature_wrapper=True,
+        reward_function_factory=reward_function_factory,
+        with_model_wrapper=True)
+
+    def rl_alg_factory(env):
+        return ValueIteration(env, {})
+
+    states = [0, 4, 8, 9, 10, 14, 15]
+    expert_trajs = [{
+        'states': states,
+        'actions': [1, 1, 2, 2, 1, 2],
+        'rewards': [0., 0., 0., 0., 0., 1.],
+        'true_rewards': [],
+        'features': [to_one_hot(state, 16) for state in states[1:]]
+    }]
+    return MaxCausalEntIRL(env, expert_trajs, rl_alg_factory, [],
+                           {'verbose': False})
+
+
+def test_sa_visitations():
+    irl = make_mce_irl()
+    sa_visit_count, P0 = irl.sa_visitations()
+    assert sa_visit_count.shape == (irl.n_states, irl.n_actions)
+    assert P0.shape == (irl.n_states, )
+    # last state of the trajectory has no action and is not counted:
+    assert np.sum(sa_visit_count) == 6
+    assert sa_visit_count[0, 1] == 1
+    assert sa_visit_count[9, 2] == 1
+    assert np.sum(sa_visit_count[15]) == 0
+    # expert always starts in state 0:
+    assert P0[0] == 1.
+    assert np.sum(P0) == 1.
+
+
+def test_occupancy_measure_closed_form():
+    irl = make_mce_irl()
+    policy = np.ones((irl.n_states, irl.n_actions)) / irl.n_actions
+    initial_state_dist = np.zeros(irl.n_states)
+    initial_state_dist[0] = 1.
+
+    d = irl.occupancy_measure(policy, initial_state_dist)
+    assert d.shape == (irl.n_states, )
+    # discounted number of visits sums to 1 / (1 - gamma):
+    assert np.isclose(np.sum(d), 1. / (1. - irl.config['gamma']))
+
+    # closed form solution has to match iterating until convergence:
+    d_iterated = irl.occupancy_measure(
+        policy, initial_state_dist, t_max=10000, threshold=1e-12)
+    assert np.allclose(d, d_iterated)
+
+
+def test_occupancy_measure_sparse_transitions():
+    irl = make_mce_irl()
+    policy = np.random.rand(irl.n_states, irl.n_actions)
+    policy /= np.sum(policy, axis=1, keepdims=True)
+    initial_state_dist = np.ones(irl.n_states) / irl.n_states
+
+    d_dense = irl.occupancy_measure(policy, initial_state_dist)
+    d_dense_t_max = irl.occupancy_measure(
+        policy, initial_state_dist, t_max=10)
+
+    irl.transition_matrix = sparse.COO.from_numpy(irl.transition_matrix)
+    d_sparse = irl.occupancy_measure(policy, initial_state_dist)
+    d_sparse_t_max = irl.occupancy_measure(
+        policy, initial_state_dist, t_max=10)
+
+    assert isinstance(d_sparse, np.ndarray)
+    assert np.allclose(d_dense, d_sparse)
+    assert np.allclose(d_dense_t_max, d_sparse_t_max)
+
+
+def test_identity_feature_map_skipped():
+    irl = make_mce_irl()
+    # FrozenLake uses one-hot state features:
+    assert irl.feat_map is None
+
+
+def test_occupancy_measure_finite_horizon():
+    irl = make_mce_irl()
+    policy = np.ones((irl.n_states, irl.n_actions)) / irl.n_actions
+    initial_state_dist = np.zeros(irl.n_states)
+    initial_state_dist[0] = 1.
+
+    # a single step only visits the initial states:
+    d_1 = irl.occupancy_measure(policy, initial_state_dist, t_max=1)
+    assert np.allclose(d_1, initial_state_dist)
+    # each step adds gamma^t to the discounted number of visits:
+    d_3 = irl.occupancy_measure(policy, initial_state_dist, t_max=3)
+    assert np.isclose(np.sum(d_3), 1. + irl.config['gamma'] +
+                      irl.config['gamma']**2)
+
+    # a large t_max stops once changes are below threshold:
+    d = irl.occupancy_measure(policy, initial_state_dist)
+    d_converged = irl.occupancy_measure(
+        policy, initial_state_dist, t_max=10**9, threshold=1e-6)
+    assert np.allclose(d, d_converged, atol=1e-5)
+
+
+def test_occupancy_measure_sparse_warm_start():
+    irl = make_mce_irl()
+    initial_state_dist = np.ones(irl.n_states) / irl.n_states
+    policies = []
+    for _ in range(3):
+        policy = np.random.rand(irl.n_states, irl.n_actions)
+        policies.append(policy / np.sum(policy, axis=1, keepdims=True))
+    d_dense = [
+        irl.occupancy_measure(policy, initial_state_dist)
+        for policy in policies
+    ]
+
+    irl.transition_matrix = sparse.COO.from_numpy(irl.transition_matrix)
+    for policy, d in zip(policies, d_dense):
+        # each call starts from the occupancy measure of the previous one:
+        d_sparse = irl.occupancy_measure(policy, initial_state_dist)
+        assert np.allclose(d, d_sparse, atol=1e-4)
+
+
+def test_policy_feature_count():
+    irl = make_mce_irl()
+    n_states = irl.n_states - 1
+    policy = np.random.rand(irl.n_states, irl.n_actions)
+    policy /= np.sum(policy, axis=1, keepdims=True)
+    occupancy = np.random.rand(n_states)
+
+    # identity feature map:
+    assert np.array_equal(
+        irl.policy_feature_count(policy, occupancy), occupancy)
+
+    # state features:
+    irl.feat_map = np.random.rand(n_states, 3)
+    assert np.allclose(
+        irl.policy_feature_count(policy, occupancy),
+        irl.feat_map.T.dot(occupancy))
+
+    # state-action features:
+    irl.feat_map = np.random.rand(n_states, irl.n_actions, 3)
+    desired = np.zeros(3)
+    for state in range(n_states):
+        for action in range(irl.n_actions):
+            desired += occupancy[state] * policy[state, action] * \
+                irl.feat_map[state, action]
+    for _ in range(2):
+        # second call uses cached contraction order:
+        assert np.allclose(
+            irl.policy_feature_count(policy, occupancy), desired)
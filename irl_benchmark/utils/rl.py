@@ -22,7 +22,10 @@ def true_reward_per_traj(trajs: List[Dict[str, list]]) -> float:
         The undiscounted average sum of true rewards per trajectory.
 
     """
-    true_reward_sum = 0
-    for traj in trajs:
-        true_reward_sum += np.sum(traj['true_rewards'])
+    # sum up the rewards of all trajectories in a single call:
+    true_reward_sum = np.sum(
+        np.concatenate([
+            np.asarray(traj['true_rewards'], dtype=np.float64)
+            for traj in trajs
+        ]))
     return true_reward_sum / len(trajs)
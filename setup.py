@@ -32,6 +32,7 @@ setup(
         'gym>=0.10.5',
         'cvxpy>=1.0.9',
         'numpy>=1.15.0',
+        'scipy>=1.1.0',
         'typing>=3.6.4',
         'setuptools>=40.0.0',
         'comet_ml>=1.0.31',